@@ -116,10 +116,8 @@ def adrp(debugger, command, exe_ctx, result, internal_dict):
 
 
 def calculate_adrp_result_with_immediate_and_pc_address(immediate: int, pc_address: int) -> Tuple[int, str]:
-    immediate_value_temp = immediate * 4096
-    pc_address_value_temp = pc_address - pc_address % 4096
-
-    result_value: int = immediate_value_temp + pc_address_value_temp
+    # (immediate * 4096) + (pc_address - pc_address % 4096)
+    result_value: int = (immediate << 12) + (pc_address & ~0xFFF)
     return result_value, hex(result_value)
 
 
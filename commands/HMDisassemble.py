@@ -23,13 +23,41 @@
 # https://github.com/chenhuimao/HMLLDB
 
 import lldb
-from typing import Dict, List, Optional, Tuple
+import functools
+import re
+from typing import Callable, Dict, List, Optional, Tuple
 import HMCalculationHelper
 import HMLLDBClassInfo
 import HMLLDBHelpers as HM
 import HMReference
 
 
+# Only adr/adrp and b/bl instructions get my comment
+# The opcode bytes (-b) and the control flow kind (-k) may be printed before the mnemonic
+g_commentable_instruction_pattern = re.compile(r':\s+(?:[^\s;]+\s+){0,3}(?:adrp?|bl?)\s')
+
+g_branch_mnemonics = frozenset(('b', 'bl'))
+g_register_branch_mnemonics = frozenset(('br', 'blr'))
+g_adrp_mnemonics = frozenset(('adr', 'adrp'))
+g_skipped_mnemonics = frozenset(('str', 'nop'))
+
+# [branch_target_address, my_comment], cleared every time edisassemble is executed
+g_branch_target_comment_dict: Dict[int, str] = {}
+
+# Analyzers that calculate the value of the target register
+g_register_analyzers: Dict[str, Callable[[lldb.SBExecutionContext, lldb.SBInstruction, Dict[str, int]], tuple]] = {
+    'adr': HMReference.analyze_adrp,
+    'adrp': HMReference.analyze_adrp,
+    'add': HMReference.analyze_add,
+    'ldr': HMReference.analyze_ldr,
+    'ldrsw': HMReference.analyze_ldr,
+    'mov': HMReference.analyze_mov,
+}
+
+# The address at the beginning of the assemble line, such as "->  0x102b8f544 <+0>:" or "DemoApp[0x102b8f544]:"
+g_assemble_line_address_pattern = re.compile(r'^\s*(?:->\s+)?(?:[^\s\[\]]*\[(0x[0-9a-fA-F]+)\]|(0x[0-9a-fA-F]+)):?\s+\S')
+
+
 def __lldb_init_module(debugger, internal_dict):
     debugger.HandleCommand('command script add -f HMDisassemble.enhanced_disassemble edisassemble -h "Enhanced disassemble"')
 
@@ -55,29 +83,35 @@ def enhanced_disassemble(debugger, command, exe_ctx, result, internal_dict):
 
     original_output = return_object.GetOutput()
     if not HM.is_arm64(exe_ctx.GetTarget()):
-        if return_object.GetOutputSize() > 0:
-            print(original_output)
-        else:
-            debugger.HandleCommand(f"disassemble {command}")
+        print(original_output)
+        return
+
+    # Lookup results may change after the target reloads
+    cached_image_lookup_summary.cache_clear()
+    g_branch_target_comment_dict.clear()
+
+    # Skip the analysis if there is no instruction to comment
+    if not g_commentable_instruction_pattern.search(original_output):
+        result.AppendMessage(original_output.rstrip("\n"))
         return
 
     target = exe_ctx.GetTarget()
-    assemble_lines = original_output.splitlines()
+    # [(assemble_line, address_int, comment_index)]
+    parsed_lines: List[Tuple[str, int, int]] = []
     address_comment_dict: Dict[int, str] = {}
     original_comment_index = -1
     max_assemble_line_length = 0
 
-    # Read continuous instructions
+    # Find continuous instructions, [(first_address_int, continuous_instructions_count)]
+    continuous_ranges: List[Tuple[int, int]] = []
     first_address_int = lldb.LLDB_INVALID_ADDRESS
     continuous_instructions_count = 0
-    for line in assemble_lines:
+    for line in original_output.splitlines():
         address_int = get_address_from_assemble_line(line)
         if address_int == lldb.LLDB_INVALID_ADDRESS:
+            parsed_lines.append((line, address_int, -1))
             if first_address_int != lldb.LLDB_INVALID_ADDRESS and continuous_instructions_count > 0:
-                address: lldb.SBAddress = lldb.SBAddress(first_address_int, target)
-                instruction_list: lldb.SBInstructionList = target.ReadInstructions(address, continuous_instructions_count)
-                # Find instructions without comment
-                set_my_comment_in_dict(exe_ctx, address_comment_dict, instruction_list)
+                append_continuous_range(continuous_ranges, first_address_int, continuous_instructions_count)
             # Reset variables
             first_address_int = lldb.LLDB_INVALID_ADDRESS
             continuous_instructions_count = 0
@@ -88,35 +122,54 @@ def enhanced_disassemble(debugger, command, exe_ctx, result, internal_dict):
         continuous_instructions_count += 1
 
         # Get comment index
-        if original_comment_index == -1 and line.rfind(';') >= 0:
-            original_comment_index = line.rfind(';')
+        comment_index = line.rfind(';')
+        parsed_lines.append((line, address_int, comment_index))
+        if original_comment_index == -1 and comment_index >= 0:
+            original_comment_index = comment_index
         max_assemble_line_length = max(max_assemble_line_length, len(line))
 
     # Set comment index if needed
     if original_comment_index == -1:
         original_comment_index = max_assemble_line_length + 4
 
-    # Read last continuous instructions
+    # Record last continuous instructions
     if first_address_int != lldb.LLDB_INVALID_ADDRESS and continuous_instructions_count > 0:
-        address: lldb.SBAddress = lldb.SBAddress(first_address_int, target)
-        instruction_list: lldb.SBInstructionList = target.ReadInstructions(address, continuous_instructions_count)
-        # Find instructions without comment
-        set_my_comment_in_dict(exe_ctx, address_comment_dict, instruction_list)
+        append_continuous_range(continuous_ranges, first_address_int, continuous_instructions_count)
+
+    # Read all instructions and index them by load address
+    instruction_dict: Dict[int, lldb.SBInstruction] = {}
+    for range_address_int, range_instructions_count in continuous_ranges:
+        address: lldb.SBAddress = lldb.SBAddress(range_address_int, target)
+        instruction_list: lldb.SBInstructionList = target.ReadInstructions(address, range_instructions_count)
+        for instruction in instruction_list:
+            instruction_dict[instruction.GetAddress().GetLoadAddress(target)] = instruction
+
+    # Find instructions without comment
+    set_my_comment_in_dict(exe_ctx, address_comment_dict, instruction_dict)
+
+    # Nothing to add, so the output is the same as the original
+    if len(address_comment_dict) == 0:
+        result.AppendMessage(original_output.rstrip("\n"))
+        return
 
     # Print result
-    for line in assemble_lines:
-        address_int = get_address_from_assemble_line(line)
+    output_lines: List[str] = []
+    append_output_line = output_lines.append
+    get_my_comment = address_comment_dict.get
+    for line, address_int, comment_index in parsed_lines:
         if address_int == lldb.LLDB_INVALID_ADDRESS:
-            result.AppendMessage(line)
+            append_output_line(line)
             continue
-        is_contain_comment = ';' in line
-        if is_contain_comment:
+        if comment_index >= 0:
             # Sometimes instruction.GetComment(target) cannot obtain the comment, so it needs to be judged again.
-            result.AppendMessage(line)
-        elif address_int in address_comment_dict:
-            result.AppendMessage(f"{line.ljust(original_comment_index)}; {address_comment_dict[address_int]}")
+            append_output_line(line)
+            continue
+        my_comment = get_my_comment(address_int)
+        if my_comment:
+            append_output_line(f"{line:<{original_comment_index}}; {my_comment}")
         else:
-            result.AppendMessage(line)
+            append_output_line(line)
+    result.AppendMessage("\n".join(output_lines))
 
 
 def get_address_from_assemble_line(assemble_line: str) -> int:
@@ -130,51 +183,50 @@ def get_address_from_assemble_line(assemble_line: str) -> int:
 
     # DemoApp[0x10ed465e0]: adrp   x1, 15197
 
-    keywords = assemble_line.split()
-    if len(keywords) < 2:
+    match = g_assemble_line_address_pattern.match(assemble_line)
+    if match is None:
         return lldb.LLDB_INVALID_ADDRESS
+    return int(match.group(1) or match.group(2), 16)
+
 
-    address_str = keywords[0].rstrip(':')
-    if keywords[0] == '->':
-        address_str = keywords[1].rstrip(':')
+@functools.lru_cache(maxsize=4096)
+def cached_image_lookup_summary(address_int: int) -> str:
+    return HM.get_image_lookup_summary_from_address_int(address_int)
 
-    # Get the contents of []
-    start = address_str.find('[')
-    end = address_str.find(']')
-    if 0 <= start < end:
-        address_str = address_str[start + 1:end]
 
-    is_valid, address_int = HM.int_value_from_string(address_str)
-    if is_valid:
-        return address_int
-    return lldb.LLDB_INVALID_ADDRESS
+def append_continuous_range(continuous_ranges: List[Tuple[int, int]], first_address_int: int, instructions_count: int) -> None:
+    # Merge with the previous range if they are adjacent, so that they can be read at once
+    if len(continuous_ranges) > 0:
+        last_address_int, last_instructions_count = continuous_ranges[-1]
+        if last_address_int + last_instructions_count * 4 == first_address_int:
+            continuous_ranges[-1] = (last_address_int, last_instructions_count + instructions_count)
+            return
+    continuous_ranges.append((first_address_int, instructions_count))
 
 
-def set_my_comment_in_dict(exe_ctx: lldb.SBExecutionContext, address_comment_dict: Dict[int, str], instruction_list: lldb.SBInstructionList):
+def set_my_comment_in_dict(exe_ctx: lldb.SBExecutionContext, address_comment_dict: Dict[int, str], instruction_dict: Dict[int, lldb.SBInstruction]):
     target = exe_ctx.GetTarget()
-    instruction_count = instruction_list.GetSize()
-    for i in range(instruction_count):
-        instruction: lldb.SBInstruction = instruction_list.GetInstructionAtIndex(i)
+    for load_address_int, instruction in instruction_dict.items():
         mnemonic: str = instruction.GetMnemonic(target)
-        if mnemonic in ['b', 'bl']:
+        if mnemonic in g_branch_mnemonics:
             # Record all branch logic
-            record_branch_logic(exe_ctx, instruction, address_comment_dict)
-        elif mnemonic in ['adr', 'adrp']:
+            record_branch_logic(exe_ctx, instruction, load_address_int, address_comment_dict)
+        elif mnemonic in g_adrp_mnemonics:
             # Record all adr/adrp logic
-            record_adrp_logic(exe_ctx, instruction, address_comment_dict)
+            record_adrp_logic(exe_ctx, instruction, load_address_int, instruction_dict, address_comment_dict)
 
 
-def record_branch_logic(exe_ctx: lldb.SBExecutionContext, branch_instruction: lldb.SBInstruction, address_comment_dict: Dict[int, str]) -> None:
+def record_branch_logic(exe_ctx: lldb.SBExecutionContext, branch_instruction: lldb.SBInstruction, branch_instruction_load_address: int, address_comment_dict: Dict[int, str]) -> None:
     target = exe_ctx.GetTarget()
     comment = branch_instruction.GetComment(target)
     if len(comment) > 0:
         return
-    my_comment = comment_for_branch(exe_ctx, branch_instruction)
+    my_comment = comment_for_branch(exe_ctx, branch_instruction.GetOperands(target))
     if len(my_comment) > 0:
-        address_comment_dict[branch_instruction.GetAddress().GetLoadAddress(target)] = my_comment
+        address_comment_dict[branch_instruction_load_address] = my_comment
 
 
-def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.SBInstruction, address_comment_dict: Dict[int, str]) -> None:
+def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.SBInstruction, adrp_instruction_load_address: int, instruction_dict: Dict[int, lldb.SBInstruction], address_comment_dict: Dict[int, str]) -> None:
     # Analyze the specified instructions after adrp in sequence, and analyze up to 8 instructions.
     # FIXME: x0 and w0 registers are independent and need to be merged.
     register_dic: Dict[str, int] = {}
@@ -185,7 +237,6 @@ def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.S
     if not can_analyze_adrp:
         return
 
-    adrp_instruction_load_address: int = adrp_instruction.GetAddress().GetLoadAddress(target)
     comment = adrp_instruction.GetComment(target)
     if len(comment) == 0:
         adrp_comment = f"{adrp_target_register} = {hex(adrp_result)}"
@@ -193,32 +244,40 @@ def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.S
 
     # Analyze the specified instructions after adr/adrp
     instruction_count = 8
-    address: lldb.SBAddress = lldb.SBAddress(adrp_instruction_load_address + 4, target)
-    instruction_list: lldb.SBInstructionList = target.ReadInstructions(address, instruction_count)
+    following_instructions: List[lldb.SBInstruction] = []
     for i in range(instruction_count):
-        instruction: lldb.SBInstruction = instruction_list.GetInstructionAtIndex(i)
-        comment = instruction.GetComment(target)
+        instruction = instruction_dict.get(adrp_instruction_load_address + 4 * (i + 1))
+        if instruction is None:
+            break
+        following_instructions.append(instruction)
+    if len(following_instructions) < instruction_count:
+        # Read the instructions beyond the disassembly range
+        address: lldb.SBAddress = lldb.SBAddress(adrp_instruction_load_address + 4 * (len(following_instructions) + 1), target)
+        following_instructions.extend(target.ReadInstructions(address, instruction_count - len(following_instructions)))
+
+    for i, instruction in enumerate(following_instructions):
         mnemonic: str = instruction.GetMnemonic(target)
-        instruction_load_address_int: int = instruction.GetAddress().GetLoadAddress(target)
+        # arm64 instructions are fixed at 4 bytes
+        instruction_load_address_int: int = adrp_instruction_load_address + 4 * (i + 1)
         if mnemonic == 'add':
             can_analyze_add, target_register_str, add_value = HMReference.analyze_add(exe_ctx, instruction, register_dic)
             if not can_analyze_add:
                 break
-            if len(comment) == 0:
-                lookup_summary = HM.get_image_lookup_summary_from_address(hex(add_value))
+            if len(instruction.GetComment(target)) == 0:
+                lookup_summary = cached_image_lookup_summary(add_value)
                 add_comment = f"{target_register_str} = {hex(add_value)} {lookup_summary}"
                 address_comment_dict[instruction_load_address_int] = add_comment
         elif mnemonic == 'ldr':
             can_analyze_ldr, can_get_load_address, target_register_str, load_address_int, load_result_int = HMReference.analyze_ldr(exe_ctx, instruction, register_dic)
             if not can_get_load_address:
                 break
-            if len(comment) == 0:
+            if len(instruction.GetComment(target)) == 0:
                 lookup_summary = ""
                 # lookup <load_result_int> first, if there is no result, lookup <load_address_int>
                 if can_analyze_ldr:
-                    lookup_summary = HM.get_image_lookup_summary_from_address(hex(load_result_int))
+                    lookup_summary = cached_image_lookup_summary(load_result_int)
                 if len(lookup_summary) == 0:
-                    lookup_summary = HM.get_image_lookup_summary_from_address(hex(load_address_int))
+                    lookup_summary = cached_image_lookup_summary(load_address_int)
 
                 if can_analyze_ldr:
                     ldr_comment = f"{target_register_str} = {hex(load_result_int)} {lookup_summary}"
@@ -233,15 +292,15 @@ def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.S
             if not can_analyze_ldrsw:
                 break
             # The ldrsw instruction records the result address in memory
-            if len(comment) == 0:
-                lookup_summary = HM.get_image_lookup_summary_from_address(hex(load_result_int))
+            if len(instruction.GetComment(target)) == 0:
+                lookup_summary = cached_image_lookup_summary(load_result_int)
                 ldr_comment = f"{target_register_str} = {hex(load_result_int)} {lookup_summary}"
                 address_comment_dict[instruction_load_address_int] = ldr_comment
         elif mnemonic == 'mov':
             can_analyze_mov, target_register_str, mov_value = HMReference.analyze_mov(exe_ctx, instruction, register_dic)
             if not can_analyze_mov:
                 break
-            if len(comment) == 0:
+            if len(instruction.GetComment(target)) == 0:
                 mov_comment = f"{target_register_str} = {hex(mov_value)}"
                 address_comment_dict[instruction_load_address_int] = mov_comment
         elif mnemonic == 'str':
@@ -254,15 +313,20 @@ def record_adrp_logic(exe_ctx: lldb.SBExecutionContext, adrp_instruction: lldb.S
     return
 
 
-def comment_for_branch(exe_ctx: lldb.SBExecutionContext, branch_instruction: lldb.SBInstruction) -> str:
-    target = exe_ctx.GetTarget()
-
+def comment_for_branch(exe_ctx: lldb.SBExecutionContext, branch_operands: str) -> str:
     # Find the target address of the branch instruction
-    branch_operands = branch_instruction.GetOperands(target)
     is_valid_address, address_int = HM.int_value_from_string(branch_operands)
     if not is_valid_address:
         return ""
 
+    # Many branches jump to the same target, such as the objc_msgSend stub
+    if address_int not in g_branch_target_comment_dict:
+        g_branch_target_comment_dict[address_int] = comment_for_branch_target(exe_ctx, address_int)
+    return g_branch_target_comment_dict[address_int]
+
+
+def comment_for_branch_target(exe_ctx: lldb.SBExecutionContext, address_int: int) -> str:
+    target = exe_ctx.GetTarget()
     address: lldb.SBAddress = lldb.SBAddress(address_int, target)
 
     # Read 10 instructions of target address
@@ -275,45 +339,30 @@ def comment_for_branch(exe_ctx: lldb.SBExecutionContext, branch_instruction: lld
     register_dic: Dict[str, int] = {}
     for i in range(instruction_count):
         instruction: lldb.SBInstruction = instruction_list.GetInstructionAtIndex(i)
-        comment = instruction.GetComment(target)
         mnemonic: str = instruction.GetMnemonic(target)
-        if mnemonic in ['br', 'blr']:
+        if mnemonic in g_register_branch_mnemonics:
             # Get the comment of the target address of the next branch instruction
             operands = instruction.GetOperands(target)
             if operands not in register_dic:
                 return ""
             target_result = register_dic[operands]
-            lookup_summary = HM.get_image_lookup_summary_from_address(hex(target_result))
+            lookup_summary = cached_image_lookup_summary(target_result)
             my_comment = f"{mnemonic} {operands}, {operands} = {hex(target_result)} {lookup_summary}"
 
             # resolve "x1" register when target is objc_msgSend
             if 'objc_msgSend' in lookup_summary and 'x1' in register_dic:
                 x1_value = register_dic['x1']
-                # Sometimes the summary is missing when using "image lookup", so use the "x/s" command instead.
-                x1_str_return_object = lldb.SBCommandReturnObject()
-                exe_ctx.GetTarget().GetDebugger().GetCommandInterpreter().HandleCommand(f"x/s {x1_value}", exe_ctx, x1_str_return_object)
-                output_list = x1_str_return_object.GetOutput().split(" ")
-                if len(output_list) >= 2:
-                    x1_str_result = output_list[1]
-                    my_comment = f"{my_comment}, sel = {x1_str_result}"
+                # Sometimes the summary is missing when using "image lookup", so read the selector name from memory instead.
+                error = lldb.SBError()
+                x1_str_result = exe_ctx.GetProcess().ReadCStringFromMemory(x1_value, 256, error)
+                if error.Success() and x1_str_result:
+                    my_comment = f"{my_comment}, sel = \"{x1_str_result}\""
             return my_comment
-        elif mnemonic in ['adr', 'adrp']:
-            can_analyze_adrp, _, _ = HMReference.analyze_adrp(exe_ctx, instruction, register_dic)
-            if not can_analyze_adrp:
-                return ""
-        elif mnemonic == 'add':
-            can_analyze_add, _, _ = HMReference.analyze_add(exe_ctx, instruction, register_dic)
-            if not can_analyze_add:
-                return ""
-        elif mnemonic in ['ldr', 'ldrsw']:
-            can_analyze_ldr, _, _, _, _ = HMReference.analyze_ldr(exe_ctx, instruction, register_dic)
-            if not can_analyze_ldr:
-                return ""
-        elif mnemonic == 'mov':
-            can_analyze_mov, _, _ = HMReference.analyze_mov(exe_ctx, instruction, register_dic)
-            if not can_analyze_mov:
+        elif mnemonic in g_register_analyzers:
+            # The first element of the analysis result indicates whether the analysis succeeded
+            if not g_register_analyzers[mnemonic](exe_ctx, instruction, register_dic)[0]:
                 return ""
-        elif mnemonic in ['str', 'nop']:
+        elif mnemonic in g_skipped_mnemonics:
             continue
         else:
             return ""
@@ -24,12 +24,24 @@
 
 import lldb
 import HMLLDBHelpers as HM
-import os
 import shlex
+import subprocess
 import optparse
+from typing import List, Optional
+
+
+# Option parsers are created once in __lldb_init_module and reused by every command invocation
+g_home_directory_parser: Optional[optparse.OptionParser] = None
+g_bundle_path_parser: Optional[optparse.OptionParser] = None
+g_delete_file_parser: Optional[optparse.OptionParser] = None
 
 
 def __lldb_init_module(debugger, internal_dict):
+    global g_home_directory_parser, g_bundle_path_parser, g_delete_file_parser
+    g_home_directory_parser = generate_option_parser("phomedirectory")
+    g_bundle_path_parser = generate_option_parser("pbundlepath")
+    g_delete_file_parser = generate_DeleteFile_optionParser()
+
     debugger.HandleCommand('command script add -f HMFileCommands.pHomeDirectory phomedirectory -h "Print the path of the home directory."')
     debugger.HandleCommand('command script add -f HMFileCommands.pBundlePath pbundlepath -h "Print the path of the main bundle."')
     debugger.HandleCommand('command script add -f HMFileCommands.deleteFile deletefile -h "Delete the specified file in the sandbox."')
@@ -51,7 +63,7 @@ def pHomeDirectory(debugger, command, exe_ctx, result, internal_dict):
     """
 
     command_args = shlex.split(command)
-    parser = generate_option_parser("phomedirectory")
+    parser = g_home_directory_parser
     try:
         # options: optparse.Values
         # args: list
@@ -64,7 +76,7 @@ def pHomeDirectory(debugger, command, exe_ctx, result, internal_dict):
     path = homeDirectoryValue.GetObjectDescription()
     HM.DPrint(path)
     if options.open:
-        os.system('open ' + path)
+        subprocess.run(['open', path])
 
 
 def pBundlePath(debugger, command, exe_ctx, result, internal_dict):
@@ -83,7 +95,7 @@ def pBundlePath(debugger, command, exe_ctx, result, internal_dict):
     """
 
     command_args = shlex.split(command)
-    parser = generate_option_parser("pbundlepath")
+    parser = g_bundle_path_parser
     try:
         # options: optparse.Values
         # args: list
@@ -98,7 +110,7 @@ def pBundlePath(debugger, command, exe_ctx, result, internal_dict):
     if options.open:
         # Cannot open the bundle, so we open the directory where the bundle is located.
         directoryValue = HM.evaluate_expression_value(f'(NSString *)[(NSString *){bundlePathValue.GetValue()} stringByDeletingLastPathComponent]')
-        os.system('open ' + directoryValue.GetObjectDescription())
+        subprocess.run(['open', directoryValue.GetObjectDescription()])
 
 
 def deleteFile(debugger, command, exe_ctx, result, internal_dict):
@@ -125,7 +137,7 @@ def deleteFile(debugger, command, exe_ctx, result, internal_dict):
     """
 
     command_args = shlex.split(command)
-    parser = generate_DeleteFile_optionParser()
+    parser = g_delete_file_parser
     try:
         # options: optparse.Values
         # args: list
@@ -134,43 +146,9 @@ def deleteFile(debugger, command, exe_ctx, result, internal_dict):
         result.SetError(parser.usage)
         return
 
-    hasOption = False
-
-    if options.all:
-        # Reserve the directory under the Home directory
-        hasOption = True
-        subFileArrayValue = HM.evaluate_expression_value("[[NSFileManager defaultManager] contentsOfDirectoryAtPath:(NSString *)NSHomeDirectory() error:nil]")
-        for i in range(subFileArrayValue.GetNumChildren()):
-            subFileValue = subFileArrayValue.GetChildAtIndex(i)
-            HM.DPrint("=============" + subFileValue.GetObjectDescription() + "=============")
-            subFilePathValue = HM.evaluate_expression_value(f"[(NSString *)NSHomeDirectory() stringByAppendingPathComponent:(NSString *){subFileValue.GetValue()}]")
-            deleteAllFileInDirectory(subFilePathValue.GetObjectDescription())
-
-    if options.documents:
-        hasOption = True
-        documentsDirectoryValue = HM.evaluate_expression_value("(NSString *)[NSSearchPathForDirectoriesInDomains(NSDocumentDirectory, NSUserDomainMask, YES) firstObject]")
-        deleteAllFileInDirectory(documentsDirectoryValue.GetObjectDescription())
-
-    if options.library:
-        hasOption = True
-        libraryDirectoryValue = HM.evaluate_expression_value("(NSString *)[NSSearchPathForDirectoriesInDomains(NSLibraryDirectory, NSUserDomainMask, YES) firstObject]")
-        deleteAllFileInDirectory(libraryDirectoryValue.GetObjectDescription())
-
-    if options.tmp:
-        hasOption = True
-        tmpDirectoryValue = HM.evaluate_expression_value("(NSString *)NSTemporaryDirectory()")
-        deleteAllFileInDirectory(tmpDirectoryValue.GetObjectDescription())
-
-    if options.caches:
-        hasOption = True
-        cachesDirectoryValue = HM.evaluate_expression_value("(NSString *)[NSSearchPathForDirectoriesInDomains(NSCachesDirectory, NSUserDomainMask, YES) firstObject]")
-        deleteAllFileInDirectory(cachesDirectoryValue.GetObjectDescription())
-
-    if options.preferences:
-        hasOption = True
-        libraryDirectoryValue = HM.evaluate_expression_value("(NSString *)[NSSearchPathForDirectoriesInDomains(NSLibraryDirectory, NSUserDomainMask, YES) firstObject]")
-        preferencesDirectoryValue = HM.evaluate_expression_value(f"(NSString *)[(NSString *){libraryDirectoryValue.GetValue()} stringByAppendingPathComponent:@\"Preferences\"]")
-        deleteAllFileInDirectory(preferencesDirectoryValue.GetObjectDescription())
+    hasOption = options.all or options.documents or options.library or options.tmp or options.caches or options.preferences
+    if hasOption:
+        deleteAllFileInDirectories(options)
 
     if options.file:
         hasOption = True
@@ -180,29 +158,76 @@ def deleteFile(debugger, command, exe_ctx, result, internal_dict):
         HM.DPrint("Requires at least one target file/directory, Please enter \"help deletefile\" for help.")
 
 
-def deleteAllFileInDirectory(directoryPath: str) -> None:
+def deleteAllFileInDirectories(options: optparse.Values) -> None:
+    # Resolve and clean all directories in a single expression evaluation.
+    add_directory_script = ""
+    # The Library directory is shared by "--library" and "--preferences", so resolve it at most once
+    if options.library or options.preferences:
+        add_directory_script += "NSString *libraryDirectory = (NSString *)[NSSearchPathForDirectoriesInDomains(NSLibraryDirectory, NSUserDomainMask, YES) firstObject];\n"
+    # Reserve the directory under the Home directory when using "--all"
+    if options.all:
+        add_directory_script += '''
+        NSString *homeDirectory = (NSString *)NSHomeDirectory();
+        for (NSString *subFileName in [fileMgr contentsOfDirectoryAtPath:homeDirectory error:nil]) {
+            [directoryPaths addObject:[homeDirectory stringByAppendingPathComponent:subFileName]];
+        }
+        homeSubdirectoriesCount = [directoryPaths count];
+        '''
+    # Objective-C expressions of the directories whose contents will be deleted
+    directory_expressions: List[str] = []
+    if options.documents:
+        directory_expressions.append("(NSString *)[NSSearchPathForDirectoriesInDomains(NSDocumentDirectory, NSUserDomainMask, YES) firstObject]")
+    if options.library:
+        directory_expressions.append("libraryDirectory")
+    if options.tmp:
+        directory_expressions.append("(NSString *)NSTemporaryDirectory()")
+    if options.caches:
+        directory_expressions.append("(NSString *)[NSSearchPathForDirectoriesInDomains(NSCachesDirectory, NSUserDomainMask, YES) firstObject]")
+    if options.preferences:
+        directory_expressions.append("[libraryDirectory stringByAppendingPathComponent:@\"Preferences\"]")
+    for expression in directory_expressions:
+        add_directory_script += f"[directoryPaths addObject:(NSString *){expression}];\n"
+
     command_script = f'''
-        NSString *directoryPath = @"{directoryPath}";
-        NSMutableString *result = [[NSMutableString alloc] init];
         NSFileManager *fileMgr = [NSFileManager defaultManager];
-        if ([fileMgr fileExistsAtPath:directoryPath]) {{
-            NSArray *subFileArray = [fileMgr contentsOfDirectoryAtPath:directoryPath error:nil];
-            for (NSString *subFileName in subFileArray) {{
-                NSString *subFilePath = [directoryPath stringByAppendingPathComponent:subFileName];
-                if ([fileMgr removeItemAtPath:subFilePath error:nil]) {{
-                    [result appendFormat:@"removed file: %@\\n", subFilePath];
-                }} else {{
-                    [result appendFormat:@"failed to remove file: %@\\n", subFilePath];
+        NSMutableArray *directoryPaths = [[NSMutableArray alloc] init];
+        NSUInteger homeSubdirectoriesCount = 0;
+        {add_directory_script}
+        NSMutableString *result = [[NSMutableString alloc] init];
+        for (NSUInteger i = 0; i < [directoryPaths count]; i++) {{
+            NSString *directoryPath = (NSString *)[directoryPaths objectAtIndex:i];
+            // Only the directories under the Home directory have a header
+            if (i < homeSubdirectoriesCount) {{
+                [result appendFormat:@"=============%@=============\\n", [directoryPath lastPathComponent]];
+            }}
+            NSUInteger resultLength = [result length];
+            if ([fileMgr fileExistsAtPath:directoryPath]) {{
+                NSURL *directoryURL = [NSURL fileURLWithPath:directoryPath];
+                NSDirectoryEnumerator *enumerator = [fileMgr enumeratorAtURL:directoryURL includingPropertiesForKeys:@[] options:NSDirectoryEnumerationSkipsSubdirectoryDescendants errorHandler:nil];
+                NSUInteger removedCount = 0;
+                NSMutableArray *failedPaths = [[NSMutableArray alloc] init];
+                for (NSURL *subFileURL in enumerator) {{
+                    if ([fileMgr removeItemAtURL:subFileURL error:nil]) {{
+                        removedCount++;
+                    }} else {{
+                        [failedPaths addObject:[subFileURL path]];
+                    }}
+                }}
+                for (NSString *failedPath in failedPaths) {{
+                    [result appendFormat:@"failed to remove file: %@\\n", failedPath];
                 }}
+                if (removedCount + [failedPaths count] > 0) {{
+                    [result appendFormat:@"deleted %lu files under %@ (%lu failed)\\n", (unsigned long)removedCount, directoryPath, (unsigned long)[failedPaths count]];
+                }}
+            }} else {{
+                [result appendFormat:@"failed to remove non-existing file: %@\\n", directoryPath];
             }}
-        }} else {{
-            [result appendFormat:@"failed to remove non-existing file: %@\\n", directoryPath];
-        }}
 
-        if ([result length] == 0) {{
-            [result appendString:@"There are no files in this directory.\\n"];
+            if ([result length] == resultLength) {{
+                [result appendString:@"There are no files in this directory.\\n"];
+            }}
         }}
-    
+
         result;
     '''
 
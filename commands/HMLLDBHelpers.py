@@ -25,13 +25,16 @@
 import lldb
 from typing import Any, List, Tuple, Optional
 import inspect
+import struct
 import HMExpressionPrefix
 import HMLLDBClassInfo
 
 g_is_first_call = True
+g_default_expression_options: Optional[lldb.SBExpressionOptions] = None
 
 g_class_prefixes: List[str] = []  # Class Prefixes that may be user-written
 g_class_prefixes_array_address: str = "0"
+g_class_prefixes_process_id: int = 0  # The prefixes and the array belong to this process
 
 
 def process_continue() -> None:
@@ -55,12 +58,15 @@ def is_arm64(target: lldb.SBTarget = None) -> bool:
 
 def int_value_from_string(integer_str: str) -> Tuple[bool, int]:
     try:
-        if integer_str.startswith("0x") or integer_str.startswith("-0x"):
-            integer_value = int(integer_str, 16)
-        else:
-            integer_value = int(integer_str)
-        return True, integer_value
+        # Base 0 recognizes the "0x" prefix
+        return True, int(integer_str, 0)
     except:
+        # Decimal with leading zeros, e.g. "010", is rejected by base 0
+        digits_str = integer_str.strip()
+        if digits_str.startswith('-'):
+            digits_str = digits_str[1:]
+        if digits_str.isdecimal():
+            return True, int(integer_str)
         return False, 0
 
 
@@ -78,6 +84,27 @@ def evaluate_expression_value(expression: str, prefix='', print_errors=True) ->
             @import ObjectiveC;
         ''', op)
 
+    options = get_default_expression_options()
+    if len(prefix) > 0:
+        options = lldb.SBExpressionOptions(options)
+        options.SetPrefix(prefix)  # default: None
+
+    value = frame.EvaluateExpression(expression, options)
+    error = value.GetError()
+
+    if print_errors and not is_successful_of_SBError(error):
+        DPrint(error)
+        DPrint(inspect.getframeinfo(inspect.currentframe().f_back))
+
+    return value
+
+
+def get_default_expression_options() -> lldb.SBExpressionOptions:
+    # The options are the same for every expression, so they are created only once
+    global g_default_expression_options
+    if g_default_expression_options is not None:
+        return g_default_expression_options
+
     options = lldb.SBExpressionOptions()
     # options.SetCoerceResultToId(False)
     # options.SetFetchDynamicValue(0)  # default: lldb.eNoDynamicValues 0
@@ -97,22 +124,14 @@ def evaluate_expression_value(expression: str, prefix='', print_errors=True) ->
     # options.SetREPLMode(False)
     options.SetLanguage(lldb.eLanguageTypeObjC_plus_plus)
     options.SetSuppressPersistentResult(True)  # default: False
-    if len(prefix) > 0:
-        options.SetPrefix(prefix)  # default: None
     # options.SetAutoApplyFixIts(True)
     # options.SetRetriesWithFixIts(1)
 
     # options.SetTopLevel(False)
     # options.SetAllowJIT(True)
 
-    value = frame.EvaluateExpression(expression, options)
-    error = value.GetError()
-
-    if print_errors and not is_successful_of_SBError(error):
-        DPrint(error)
-        DPrint(inspect.getframeinfo(inspect.currentframe().f_back))
-
-    return value
+    g_default_expression_options = options
+    return options
 
 
 # Based on https://github.com/facebook/chisel/blob/master/fblldbbase.py
@@ -205,28 +224,25 @@ def get_module_name_from_address(address_str: str) -> str:
 
 
 def load_address_value(exe_ctx: lldb.SBExecutionContext, address_int: int) -> int:
-    ldr_return_object = lldb.SBCommandReturnObject()
-    lldb.debugger.GetCommandInterpreter().HandleCommand(f"x/a {address_int}", exe_ctx, ldr_return_object)
-    load_address_output = ldr_return_object.GetOutput()
-    if len(load_address_output) == 0:
+    target = exe_ctx.GetTarget()
+    error = lldb.SBError()
+    data: bytes = target.ReadMemory(lldb.SBAddress(address_int, target), 8, error)
+    if not error.Success() or data is None or len(data) != 8:
         return -1
 
-    ldr_result = load_address_output.split()[1]
-    return int(ldr_result, 16)
+    return struct.unpack("<Q", data)[0]
 
 
 def load_address_value_signed_word(exe_ctx: lldb.SBExecutionContext, address_int: int) -> int:
-    ldrsw_return_object = lldb.SBCommandReturnObject()
-    lldb.debugger.GetCommandInterpreter().HandleCommand(f"x/a {address_int}", exe_ctx, ldrsw_return_object)
-    load_address_output = ldrsw_return_object.GetOutput()
-    if len(load_address_output) == 0:
+    target = exe_ctx.GetTarget()
+    error = lldb.SBError()
+    data: bytes = target.ReadMemory(lldb.SBAddress(address_int, target), 4, error)
+    if not error.Success() or data is None or len(data) != 4:
         return -1
 
-    ldrsw_result_list = load_address_output.split()
-    ldrsw_result = int(ldrsw_result_list[1], 16) & 0xFFFFFFFF
-    if ldrsw_result & 0x80000000 > 0:
-        ldrsw_result += 0xFFFFFFFF00000000
-    return ldrsw_result
+    # Sign-extend the word to 64 bits
+    ldrsw_result = struct.unpack("<i", data)[0]
+    return ldrsw_result & 0xFFFFFFFFFFFFFFFF
 
 
 def strip_pac_sign_address(address_int: int, process: lldb.SBProcess = None) -> int:
@@ -244,8 +260,12 @@ def get_image_lookup_summary_from_address(address_str: str) -> str:
     is_valid, address_int = int_value_from_string(address_str)
     if not is_valid:
         return "get_image_lookup_summary_from_address: Invalid address"
+    return get_image_lookup_summary_from_address_int(address_int)
+
+
+def get_image_lookup_summary_from_address_int(address_int: int) -> str:
     return_object = lldb.SBCommandReturnObject()
-    lldb.debugger.GetCommandInterpreter().HandleCommand(f"image lookup -a {address_str}", return_object)
+    lldb.debugger.GetCommandInterpreter().HandleCommand(f"image lookup -a {address_int:#x}", return_object)
     if return_object.GetErrorSize() > 0:
         return ""
     return_object_lines = return_object.GetOutput().splitlines()
@@ -259,10 +279,17 @@ def get_image_lookup_summary_from_address(address_str: str) -> str:
 def get_class_prefixes() -> Tuple[List[str], str]:
     global g_class_prefixes
     global g_class_prefixes_array_address
+    global g_class_prefixes_process_id
 
-    if len(g_class_prefixes) > 0:
+    # The array address is set after a successful scan of this process, even if no prefix is found
+    process_id = lldb.debugger.GetSelectedTarget().GetProcess().GetUniqueID()
+    if g_class_prefixes_array_address != "0" and g_class_prefixes_process_id == process_id:
         return g_class_prefixes, g_class_prefixes_array_address
 
+    # The array of the previous process is no longer valid after relaunching
+    g_class_prefixes.clear()
+    g_class_prefixes_array_address = "0"
+
     DPrint("Getting class prefixes when using this function for the first time")
 
     command_script = '''
@@ -288,9 +315,14 @@ def get_class_prefixes() -> Tuple[List[str], str]:
         return g_class_prefixes, g_class_prefixes_array_address
 
     g_class_prefixes_array_address = class_prefixes_value.GetValue()
-    for i in range(class_prefixes_value.GetNumChildren()):
-        prefix_value = class_prefixes_value.GetChildAtIndex(i)
-        g_class_prefixes.append(prefix_value.GetObjectDescription())
+    g_class_prefixes_process_id = process_id
+
+    # Read all prefixes at once instead of getting the description of each element
+    joined_prefixes_value = evaluate_expression_value(f'(const char *)[[(NSArray *){g_class_prefixes_array_address} componentsJoinedByString:@"\\n"] UTF8String]')
+    error = lldb.SBError()
+    joined_prefixes = lldb.debugger.GetSelectedTarget().GetProcess().ReadCStringFromMemory(joined_prefixes_value.GetValueAsUnsigned(), 0x100000, error)
+    if error.Success() and joined_prefixes:
+        g_class_prefixes.extend(joined_prefixes.split("\n"))
 
     return g_class_prefixes, g_class_prefixes_array_address
 
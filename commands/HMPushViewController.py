@@ -22,7 +22,7 @@
 
 # https://github.com/chenhuimao/HMLLDB
 
-from typing import Optional, List
+from typing import List, Optional
 import lldb
 import optparse
 import shlex
@@ -87,59 +87,86 @@ def push(debugger, command, exe_ctx, result, internal_dict):
 
     state = False
     if options.instance:
-        instanceExpr: str = ""
-        for string in args:
-            instanceExpr += string + " "
-        instanceExpr = instanceExpr.rstrip()
+        instanceExpr: str = " ".join(args)
         VCObject = HM.evaluate_expression_value(instanceExpr).GetValue()
+        if verifyObjIsKindOfClass(VCObject, "UIViewController"):
+            pushExpression = f"(void)[{navigationVC} pushViewController:(id){VCObject} animated:YES]"
+            HM.evaluate_expression_value(pushExpression)
+            state = True
     else:
-        makeVCExpression = f"(UIViewController *)[[NSClassFromString(@\"{args[0]}\") alloc] init]"
-        VCObject = HM.evaluate_expression_value(makeVCExpression).GetValue()     # address
-
-    if verifyObjIsKindOfClass(VCObject, "UIViewController"):
-        pushExpression = f"(void)[{navigationVC} pushViewController:(id){VCObject} animated:YES]"
-        debugger.HandleCommand('expression -l objc -O -- ' + pushExpression)
-        state = True
-    elif not options.instance:
-        classPrefixes = HM.get_class_prefixes()[0]
-        for prefix in classPrefixes:  # for Swift file
-            className = f"{prefix}.{args[0]}"
-            if not HM.is_existing_class(className):
-                continue
-
-            makeVCExpression = f"(UIViewController *)[[NSClassFromString(@\"{className}\") alloc] init]"
-            VCObject = HM.evaluate_expression_value(makeVCExpression).GetValue()  # address
-            if verifyObjIsKindOfClass(VCObject, "UIViewController"):
-                pushExpression = f"(void)[{navigationVC} pushViewController:(id){VCObject} animated:YES]"
-                debugger.HandleCommand('expression -l objc -O -- ' + pushExpression)
-                state = True
-                break
+        state = pushViewControllerWithClassNames(navigationVC, [args[0]])
+        if not state:
+            # for Swift file
+            classPrefixes = HM.get_class_prefixes()[0]
+            classNames = [f"{prefix}.{args[0]}" for prefix in classPrefixes]
+            state = pushViewControllerWithClassNames(navigationVC, classNames)
 
     HM.DPrint("push succeed" if state else "push failed")
     if state:
         HM.process_continue()
 
 
+def pushViewControllerWithClassNames(navigationVC: str, classNames: List[str]) -> bool:
+    # Initialize the first existing UIViewController in classNames and push it, in a single expression
+    if len(classNames) == 0:
+        return False
+
+    classNamesStr = ", ".join([f'@"{className}"' for className in classNames])
+    command_script = f'''
+        BOOL succeed = NO;
+        NSArray *classNames = @[{classNamesStr}];
+        for (NSString *className in classNames) {{
+            Class cls = NSClassFromString(className);
+            if (!cls) {{
+                continue;
+            }}
+            id vc = [[cls alloc] init];
+            if ([vc isKindOfClass:[UIViewController class]]) {{
+                [(UINavigationController *){navigationVC} pushViewController:vc animated:YES];
+                succeed = YES;
+                break;
+            }}
+        }}
+        (BOOL)succeed;
+    '''
+
+    value = HM.evaluate_expression_value(command_script)
+    return HM.bool_of_SBValue(value)
+
+
 def verifyObjIsKindOfClass(objAddress: str, className: str) -> bool:
     if objAddress is None or len(objAddress) == 0:
         return False
-    
-    resultValue = HM.evaluate_expression_value(f"(BOOL)[(id){objAddress} isKindOfClass:[{className} class]]")
+
+    # nil never belongs to any class, so there is no need to evaluate the expression
+    is_valid_address, address_int = HM.int_value_from_string(objAddress.strip())
+    if is_valid_address and address_int == 0:
+        return False
+
+    # objc_getClass skips the type lookup of the class name in the expression
+    resultValue = HM.evaluate_expression_value(f'(BOOL)[(id){objAddress} isKindOfClass:(Class)objc_getClass("{className}")]')
     return HM.bool_of_SBValue(resultValue)
 
 
 def getNavigationVC() -> Optional[str]:
-    rootViewController = HM.evaluate_expression_value("[[[UIApplication sharedApplication] keyWindow] rootViewController]").GetValue()
-    if verifyObjIsKindOfClass(rootViewController, "UINavigationController"):
-        return rootViewController
-    elif verifyObjIsKindOfClass(rootViewController, "UITabBarController"):
-        selectedViewController = HM.evaluate_expression_value(f"[(UITabBarController *){rootViewController} selectedViewController]").GetValue()
-        if verifyObjIsKindOfClass(selectedViewController, "UINavigationController"):
-            return selectedViewController
-        else:
-            return None
-    else:
+    command_script = '''
+        UIViewController *rootViewController = [[[UIApplication sharedApplication] keyWindow] rootViewController];
+        UIViewController *navigationViewController = nil;
+        if ([rootViewController isKindOfClass:[UINavigationController class]]) {
+            navigationViewController = rootViewController;
+        } else if ([rootViewController isKindOfClass:[UITabBarController class]]) {
+            UIViewController *selectedViewController = [(UITabBarController *)rootViewController selectedViewController];
+            if ([selectedViewController isKindOfClass:[UINavigationController class]]) {
+                navigationViewController = selectedViewController;
+            }
+        }
+        (UIViewController *)navigationViewController;
+    '''
+
+    navigationVCValue = HM.evaluate_expression_value(command_script)
+    if not HM.is_SBValue_has_value(navigationVCValue):
         return None
+    return navigationVCValue.GetValue()
 
 
 def generate_option_parser() -> optparse.OptionParser:
@@ -27,6 +27,7 @@ from datetime import datetime
 from typing import Dict, List, Tuple
 import optparse
 import os
+import re
 import shlex
 import HMCalculationHelper
 import HMLLDBClassInfo
@@ -36,6 +37,9 @@ import HMLLDBHelpers as HM
 g_image_address_target_dic: Dict[str, Dict[int, int]] = {}
 g_image_address_ldr_dic: Dict[str, Dict[int, int]] = {}
 
+# <target_register>, [<base_register>(, <offset>)]
+g_ldr_operands_pattern = re.compile(r'^([^,\s]+), \[([^,\s\]]+)(?:, ([^,\s\]]+))?\]$')
+
 
 def __lldb_init_module(debugger, internal_dict):
     debugger.HandleCommand('command script add -f HMReference.reference reference -h "Scan the image section to obtain all reference addresses of a certain address."')
@@ -113,10 +117,9 @@ def reference(debugger, command, exe_ctx, result, internal_dict):
     for key, value in address_target_dic.items():
         if value == target_address_int:
             result_count += 1
-            result_address: str = hex(key)
             if result_count == 1:
                 HM.DPrint("These are the scan results:")
-            print(f"{result_address}: {HM.get_image_lookup_summary_from_address(result_address)}")
+            print(f"{key:#x}: {HM.get_image_lookup_summary_from_address_int(key)}")
 
     HM.DPrint(f"Scan result count:{result_count}")
 
@@ -125,10 +128,9 @@ def reference(debugger, command, exe_ctx, result, internal_dict):
     for key, value in address_ldr_dic.items():
         if value == target_address_int:
             result_count += 1
-            result_address: str = hex(key)
             if result_count == 1:
                 HM.DPrint("These are the scan results in memory:")
-            print(f"{result_address}: {HM.get_image_lookup_summary_from_address(result_address)}")
+            print(f"{key:#x}: {HM.get_image_lookup_summary_from_address_int(key)}")
 
     HM.DPrint(f"Scan result count in memory:{result_count}")
 
@@ -407,18 +409,13 @@ def analyze_str(exe_ctx: lldb.SBExecutionContext, str_instruction: lldb.SBInstru
 
 # resolve ldr/ldrsw/str
 def resolve_ldr_operands(operands: str) -> Tuple[bool, str, str, str]:
-    # ldr x1, [x2, #0x9c8] -> (True, x1, x2, 0x9c8)
+    # ldr x1, [x2, #0x9c8] -> (True, x1, x2, #0x9c8)
     # ldr x1, [x2] -> (True, x1, x2, 0)
     # ldr x8, [x0, x20] -> (True, x8, x0, x20)
-    operand_list = operands.split(', ')
-    if len(operand_list) == 2:
-        return True, operand_list[0], operand_list[1].lstrip('[').rstrip(']'), "0"
-    elif len(operand_list) == 3:
-        operand_list[1] = operand_list[1].lstrip('[')
-        operand_list[2] = operand_list[2].rstrip(']')
-        return True, operand_list[0], operand_list[1], operand_list[2]
+    match = g_ldr_operands_pattern.match(operands)
+    if match:
+        return True, match.group(1), match.group(2), match.group(3) or "0"
 
     # return False
     # ldr x21, [x8, x23, lsl #3] -> (False, "", "", "0")
     return False, "", "", "0"
-
@@ -26,14 +26,19 @@ import lldb
 import math
 import optparse
 import shlex
+import sys
 from typing import Dict, List, Tuple
 import HMLLDBClassInfo
 import HMLLDBHelpers as HM
 
 
-# [register_name, register_value]
-g_last_registers_dict: Dict[str, str] = {}
-last_disassemble: str = ""
+# [register_name, (register_value_int, register_value_str)]
+g_last_registers_dict: Dict[str, Tuple[int, str]] = {}
+# The instruction at the last pc, such as "0x10431a3cc <+16>:  mov    x1, x2"
+g_last_instruction_line: str = ""
+
+# [(triple, children_num), [(register_index, register_name)]], "w" registers are excluded
+g_register_indexes_dict: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
 
 
 def __lldb_init_module(debugger, internal_dict):
@@ -64,34 +69,45 @@ def register_change(debugger, command, exe_ctx, result, internal_dict):
     if len(g_last_registers_dict) == 0:
         HM.DPrint("Get registers for the first time.")
 
-    # Is it repeated?
-    if is_executed_repeatedly(frame):
+    # Is it repeated? Check it before reading any register.
+    pc_value = frame.GetPC()
+    if is_executed_repeatedly(pc_value):
         HM.DPrint("Executed repeatedly!")
         return
 
     # When the pc register differ by 4
-    print_last_instruction_if_needed(frame)
+    print_last_instruction_if_needed(pc_value)
 
     # Print and save registers
     current_registers: lldb.SBValueList = frame.GetRegisters()
     general_purpose_registers: lldb.SBValue = current_registers.GetFirstValueByName("General Purpose Registers")
-    children_num = general_purpose_registers.GetNumChildren()
-    for i in range(children_num):
+    # A tracer such as pdb or coverage would otherwise run on every line of the register loop
+    last_trace_function = sys.gettrace()
+    sys.settrace(None)
+    try:
+        print_register_changes(exe_ctx, general_purpose_registers)
+    finally:
+        sys.settrace(last_trace_function)
+
+    # Record last instruction
+    global g_last_instruction_line
+    g_last_instruction_line = get_current_instruction_line(exe_ctx.GetTarget(), frame)
+
+
+def print_register_changes(exe_ctx: lldb.SBExecutionContext, general_purpose_registers: lldb.SBValue) -> None:
+    changed_lines: List[str] = []
+    for i, reg_name in get_register_indexes(exe_ctx.GetTarget(), general_purpose_registers):
         reg_value = general_purpose_registers.GetChildAtIndex(i)
-        reg_name = reg_value.GetName()
+        reg_value_int: int = reg_value.GetValueAsUnsigned()
         reg_value_str: str = reg_value.GetValue()
 
-        # Ignore w0 ~ w28
-        if reg_name.startswith("w"):
-            continue
-
         if reg_name not in g_last_registers_dict:
-            g_last_registers_dict[reg_name] = reg_value_str
+            g_last_registers_dict[reg_name] = (reg_value_int, reg_value_str)
             continue
 
-        last_register_value: str = g_last_registers_dict[reg_name]
-        if reg_value_str != last_register_value:
-            address: lldb.SBAddress = lldb.SBAddress(reg_value.GetValueAsUnsigned(), exe_ctx.GetTarget())
+        last_register_value_int, last_register_value = g_last_registers_dict[reg_name]
+        if reg_value_int != last_register_value_int:
+            address: lldb.SBAddress = lldb.SBAddress(reg_value_int, exe_ctx.GetTarget())
             address_desc = ""
             if address.GetSymbol().IsValid():
                 desc_stream = lldb.SBStream()
@@ -99,49 +115,75 @@ def register_change(debugger, command, exe_ctx, result, internal_dict):
                 address_desc = desc_stream.GetData()
 
             # x16:0x0000000300982fd4 -> 0x00000001c7a6f508  libobjc.A.dylib`objc_release
-            print(f"\t\t{reg_name}:{last_register_value} -> {reg_value_str}  {address_desc}")
+            changed_lines.append(f"\t\t{reg_name}:{last_register_value} -> {reg_value_str}  {address_desc}\n")
+
+        g_last_registers_dict[reg_name] = (reg_value_int, reg_value_str)
+
+    if len(changed_lines) > 0:
+        sys.stdout.write("".join(changed_lines))
 
-        g_last_registers_dict[reg_name] = reg_value_str
 
-    # Record last disassemble
-    global last_disassemble
-    last_disassemble = frame.Disassemble()
+def get_register_indexes(target: lldb.SBTarget, general_purpose_registers: lldb.SBValue) -> List[Tuple[int, str]]:
+    # The register names are fixed for the architecture, so they are read only once
+    children_num = general_purpose_registers.GetNumChildren()
+    key = (target.GetTriple(), children_num)
+    if key in g_register_indexes_dict:
+        return g_register_indexes_dict[key]
 
+    register_indexes: List[Tuple[int, str]] = []
+    for i in range(children_num):
+        reg_name = general_purpose_registers.GetChildAtIndex(i).GetName()
+        # Ignore w0 ~ w28
+        if reg_name.startswith("w"):
+            continue
+        register_indexes.append((i, reg_name))
 
-def is_executed_repeatedly(frame: lldb.SBFrame) -> bool:
+    g_register_indexes_dict[key] = register_indexes
+    return register_indexes
+
+
+def is_executed_repeatedly(pc_value: int) -> bool:
     last_pc_value: int = 0
     if "rip" in g_last_registers_dict:
-        last_pc_value = int(g_last_registers_dict["rip"], 16)
+        last_pc_value = g_last_registers_dict["rip"][0]
     if "pc" in g_last_registers_dict:
-        last_pc_value = int(g_last_registers_dict["pc"], 16)
-    return frame.GetPC() == last_pc_value
+        last_pc_value = g_last_registers_dict["pc"][0]
+    return pc_value == last_pc_value
 
 
-def print_last_instruction_if_needed(frame: lldb.SBFrame) -> None:
+def print_last_instruction_if_needed(pc_value: int) -> None:
     pc_key = "pc"
     global g_last_registers_dict
     if pc_key not in g_last_registers_dict:
         return
-    last_pc_value = int(g_last_registers_dict[pc_key], 16)
-    if frame.GetPC() - last_pc_value != 4:
+    last_pc_value = g_last_registers_dict[pc_key][0]
+    if pc_value - last_pc_value != 4:
         return
 
-    global last_disassemble
-    instruction_list: List[str] = last_disassemble.splitlines(False)
-    for instruction_line in instruction_list:
-        instruction_line_strip = instruction_line.lstrip("->").strip()
-        instruction_line_split: List[str] = instruction_line_strip.split(" ")
-        address: str = ""
-        for element in instruction_line_split:
-            if element.startswith("0x"):
-                address = element
-                break
-        if not address.startswith("0x"):
-            continue
-        address = address.rstrip(":")
-        if int(address, 16) == last_pc_value:
-            print(instruction_line_strip)
-            break
+    if len(g_last_instruction_line) > 0:
+        print(g_last_instruction_line)
+
+
+def get_current_instruction_line(target: lldb.SBTarget, frame: lldb.SBFrame) -> str:
+    pc_address: lldb.SBAddress = frame.GetPCAddress()
+    instruction_list: lldb.SBInstructionList = target.ReadInstructions(pc_address, 1)
+    if instruction_list.GetSize() == 0:
+        return ""
+    instruction: lldb.SBInstruction = instruction_list.GetInstructionAtIndex(0)
+    mnemonic_and_operands = f"{instruction.GetMnemonic(target):<6} {instruction.GetOperands(target)}"
+    # bl     0x104b6a4e4             ; symbol stub for: objc_msgSend
+    comment = instruction.GetComment(target)
+    if comment:
+        mnemonic_and_operands = f"{mnemonic_and_operands:<24} ; {comment}"
+
+    pc_value = pc_address.GetLoadAddress(target)
+    symbol_start_address: lldb.SBAddress = frame.GetSymbol().GetStartAddress()
+    if not symbol_start_address.IsValid():
+        return f"{pc_value:#x}:  {mnemonic_and_operands}"
+
+    # 0x10431a3cc <+16>:  mov    x1, x2
+    offset = pc_value - symbol_start_address.GetLoadAddress(target)
+    return f"{pc_value:#x} <+{offset}>:  {mnemonic_and_operands}"
 
 
 def register_read(debugger, command, exe_ctx, result, internal_dict):